@@ -6,19 +6,79 @@ Shows real-time user activity with timestamps, IP addresses, and response metric
 
 import sqlite3
 import json
+import time
+import orjson
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, request, Response, stream_with_context
 import os
 
+# Backslash-escapes LIKE's wildcard characters in user-supplied search text
+_LIKE_ESCAPES = str.maketrans({'\\': '\\\\', '%': '\\%', '_': '\\_'})
+
+class PoolTimeout(RuntimeError):
+    """No pooled database connection became free within pool_timeout"""
+
 class AdminDashboard:
-    def __init__(self, db_path="school_feedback.db"):
+    def __init__(self, db_path="school_feedback.db", cache_ttl=60, pool_size=4, pool_timeout=5):
         self.db_path = db_path
+        self.pool_timeout = pool_timeout
+        # Analytics change on the minute timescale, so cache them briefly
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        # Shared WAL-mode connections instead of reopening the file per request
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        # Runs independent reads alongside the request thread
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
         self.init_database()
     
+    def _connect(self):
+        """Open a tuned SQLite connection for the pool"""
+        # Every query binds its values as parameters, so a larger statement
+        # cache lets each pooled connection reuse compiled SQL across requests
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               isolation_level=None, cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute('PRAGMA cache_size=-20000')
+        return conn
+    
+    @contextmanager
+    def _get_conn(self):
+        """Borrow a pooled connection and hand it back when done"""
+        try:
+            conn = self._pool.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"no database connection free after {self.pool_timeout}s")
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+    
+    @contextmanager
+    def _dedicated_conn(self):
+        """Open a short-lived connection outside the pool, for slow consumers like streamed responses"""
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
     def init_database(self):
         """Initialize database with interactions table if it doesn't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._get_conn() as conn:
+            self._create_tables(conn.cursor())
+            self._create_rollups(conn)
+            self._has_fts = self._create_search_index(conn)
+    
+    def _create_tables(self, cursor):
+        """Create the interactions and feedback tables"""
         
         # Create interactions table if it doesn't exist
         cursor.execute('''
@@ -49,181 +109,464 @@ class AdminDashboard:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Newest-first listings walk this index instead of sorting the whole join
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_interactions_ts_desc
+            ON interactions (timestamp DESC, id DESC)
+        ''')
+        
+        # Every listing LEFT JOINs feedback on interaction_id
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_feedback_interaction
+            ON feedback (interaction_id)
+        ''')
     
-    def get_all_interactions(self, limit=100, offset=0):
-        """Get all user interactions with pagination"""
-        conn = sqlite3.connect(self.db_path)
+    def _create_rollups(self, conn):
+        """Create per-day summary tables kept current by triggers
+        
+        The analytics summary reads these instead of re-scanning the full
+        interaction and feedback history on every request. Insert, update and
+        delete triggers keep them exact whichever connection makes the change,
+        and they are rebuilt on start if their totals no longer match the
+        underlying tables (e.g. rows changed while a trigger was missing).
+        """
         cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            names = {row[0] for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+            needs_rebuild = not {
+                'interaction_stats_daily', 'feedback_stats_daily',
+                'trg_interactions_stats_ins', 'trg_interactions_stats_upd', 'trg_interactions_stats_del',
+                'trg_feedback_stats_ins', 'trg_feedback_stats_upd', 'trg_feedback_stats_del',
+            } <= names
+            
+            # query_type is stored as '' rather than NULL so the upserts can match it
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS interaction_stats_daily (
+                    day TEXT NOT NULL,
+                    query_type TEXT NOT NULL,
+                    n_interactions INTEGER NOT NULL DEFAULT 0,
+                    n_timed INTEGER NOT NULL DEFAULT 0,
+                    sum_response_time INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, query_type)
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS feedback_stats_daily (
+                    day TEXT PRIMARY KEY,
+                    n_feedback INTEGER NOT NULL DEFAULT 0,
+                    sum_rating INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            if not needs_rebuild:
+                counted = cursor.execute('SELECT COALESCE(SUM(n_interactions), 0) FROM interaction_stats_daily').fetchone()[0]
+                needs_rebuild = counted != cursor.execute('SELECT COUNT(*) FROM interactions').fetchone()[0]
+            if not needs_rebuild:
+                counted = cursor.execute('SELECT COALESCE(SUM(n_feedback), 0) FROM feedback_stats_daily').fetchone()[0]
+                needs_rebuild = counted != cursor.execute('SELECT COUNT(*) FROM feedback').fetchone()[0]
+            
+            # Triggers are recreated on every start so existing databases pick
+            # up the current definitions; timestamps that date() can't parse
+            # are counted under the '' day rather than violating NOT NULL
+            for trigger in ('trg_interactions_stats_daily', 'trg_feedback_stats_daily',
+                            'trg_interactions_stats_ins', 'trg_interactions_stats_upd', 'trg_interactions_stats_del',
+                            'trg_feedback_stats_ins', 'trg_feedback_stats_upd', 'trg_feedback_stats_del'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            
+            add_interaction = '''
+                    INSERT INTO interaction_stats_daily (day, query_type, n_interactions, n_timed, sum_response_time)
+                    VALUES (
+                        COALESCE(date(NEW.timestamp), ''),
+                        COALESCE(NEW.query_type, ''),
+                        1,
+                        CASE WHEN NEW.response_time_ms > 0 THEN 1 ELSE 0 END,
+                        CASE WHEN NEW.response_time_ms > 0 THEN NEW.response_time_ms ELSE 0 END
+                    )
+                    ON CONFLICT (day, query_type) DO UPDATE SET
+                        n_interactions = n_interactions + 1,
+                        n_timed = n_timed + excluded.n_timed,
+                        sum_response_time = sum_response_time + excluded.sum_response_time;
+            '''
+            remove_interaction = '''
+                    UPDATE interaction_stats_daily SET
+                        n_interactions = n_interactions - 1,
+                        n_timed = n_timed - (CASE WHEN OLD.response_time_ms > 0 THEN 1 ELSE 0 END),
+                        sum_response_time = sum_response_time - (CASE WHEN OLD.response_time_ms > 0 THEN OLD.response_time_ms ELSE 0 END)
+                    WHERE day = COALESCE(date(OLD.timestamp), '') AND query_type = COALESCE(OLD.query_type, '');
+                    DELETE FROM interaction_stats_daily
+                    WHERE day = COALESCE(date(OLD.timestamp), '') AND query_type = COALESCE(OLD.query_type, '')
+                      AND n_interactions <= 0;
+            '''
+            cursor.execute(f'CREATE TRIGGER trg_interactions_stats_ins AFTER INSERT ON interactions BEGIN {add_interaction} END')
+            cursor.execute(f'''
+                CREATE TRIGGER trg_interactions_stats_upd
+                AFTER UPDATE OF timestamp, query_type, response_time_ms ON interactions
+                BEGIN {remove_interaction} {add_interaction} END
+            ''')
+            cursor.execute(f'CREATE TRIGGER trg_interactions_stats_del AFTER DELETE ON interactions BEGIN {remove_interaction} END')
+            
+            add_feedback = '''
+                    INSERT INTO feedback_stats_daily (day, n_feedback, sum_rating)
+                    VALUES (COALESCE(date(NEW.timestamp), ''), 1, NEW.rating)
+                    ON CONFLICT (day) DO UPDATE SET
+                        n_feedback = n_feedback + 1,
+                        sum_rating = sum_rating + excluded.sum_rating;
+            '''
+            remove_feedback = '''
+                    UPDATE feedback_stats_daily SET
+                        n_feedback = n_feedback - 1,
+                        sum_rating = sum_rating - OLD.rating
+                    WHERE day = COALESCE(date(OLD.timestamp), '');
+                    DELETE FROM feedback_stats_daily
+                    WHERE day = COALESCE(date(OLD.timestamp), '') AND n_feedback <= 0;
+            '''
+            cursor.execute(f'CREATE TRIGGER trg_feedback_stats_ins AFTER INSERT ON feedback BEGIN {add_feedback} END')
+            cursor.execute(f'''
+                CREATE TRIGGER trg_feedback_stats_upd
+                AFTER UPDATE OF timestamp, rating ON feedback
+                BEGIN {remove_feedback} {add_feedback} END
+            ''')
+            cursor.execute(f'CREATE TRIGGER trg_feedback_stats_del AFTER DELETE ON feedback BEGIN {remove_feedback} END')
+            
+            if needs_rebuild:
+                cursor.execute('DELETE FROM interaction_stats_daily')
+                cursor.execute('DELETE FROM feedback_stats_daily')
+                cursor.execute('''
+                    INSERT INTO interaction_stats_daily (day, query_type, n_interactions, n_timed, sum_response_time)
+                    SELECT COALESCE(date(timestamp), ''), COALESCE(query_type, ''), COUNT(*),
+                           SUM(CASE WHEN response_time_ms > 0 THEN 1 ELSE 0 END),
+                           SUM(CASE WHEN response_time_ms > 0 THEN response_time_ms ELSE 0 END)
+                    FROM interactions
+                    GROUP BY 1, 2
+                ''')
+                cursor.execute('''
+                    INSERT INTO feedback_stats_daily (day, n_feedback, sum_rating)
+                    SELECT COALESCE(date(timestamp), ''), COUNT(*), SUM(rating)
+                    FROM feedback
+                    GROUP BY 1
+                ''')
+            
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+    
+    def _create_search_index(self, conn):
+        """Create a trigram FTS5 index over question and response text
         
-        cursor.execute('''
-            SELECT i.*, f.rating, f.feedback_text
+        Substring searches use it instead of scanning every row with LIKE.
+        Returns False when this SQLite build lacks FTS5 or the trigram
+        tokenizer, in which case search falls back to LIKE.
+        """
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='interactions_fts'")
+            needs_backfill = cursor.fetchone() is None
+            
+            # Keyed by id rather than rowid so VACUUM can't desynchronise it
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts
+                USING fts5(id UNINDEXED, user_question, ai_response, tokenize='trigram')
+            ''')
+            
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_interactions_fts_ins
+                AFTER INSERT ON interactions
+                BEGIN
+                    INSERT INTO interactions_fts (id, user_question, ai_response)
+                    VALUES (NEW.id, NEW.user_question, NEW.ai_response);
+                END
+            ''')
+            
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_interactions_fts_del
+                AFTER DELETE ON interactions
+                BEGIN
+                    DELETE FROM interactions_fts WHERE id = OLD.id;
+                END
+            ''')
+            
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_interactions_fts_upd
+                AFTER UPDATE OF id, user_question, ai_response ON interactions
+                BEGIN
+                    DELETE FROM interactions_fts WHERE id = OLD.id;
+                    INSERT INTO interactions_fts (id, user_question, ai_response)
+                    VALUES (NEW.id, NEW.user_question, NEW.ai_response);
+                END
+            ''')
+            
+            if needs_backfill:
+                cursor.execute('''
+                    INSERT INTO interactions_fts (id, user_question, ai_response)
+                    SELECT id, user_question, ai_response FROM interactions
+                ''')
+            
+            cursor.execute('COMMIT')
+        except sqlite3.OperationalError as e:
+            cursor.execute('ROLLBACK')
+            if str(e) in ('no such module: fts5', 'no such tokenizer: trigram'):
+                return False
+            raise
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        return True
+    
+    def _get_cached(self, key, compute):
+        """Return a cached value, recomputing it once it is older than cache_ttl"""
+        now = time.time()
+        entry = self._cache.get(key)
+        if entry is None or (now - entry[1]) > self.cache_ttl:
+            entry = (compute(), now)
+            self._cache[key] = entry
+        return entry[0]
+    
+    def clear_cache(self):
+        """Drop cached analytics so the next request re-queries the database"""
+        self._cache.clear()
+    
+    @staticmethod
+    def _rows_to_dicts(cursor):
+        """Build result dicts keyed by the column names SQLite reports"""
+        # Zipping plain tuples against names read once from cursor.description
+        # is cheaper than looking every column up by name through sqlite3.Row
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def get_all_interactions(self, limit=100, offset=0, before=None, before_id=None, before_feedback_id=None):
+        """Get all user interactions with pagination"""
+        return list(self.iter_interactions(limit=limit, offset=offset, before=before,
+                                           before_id=before_id, before_feedback_id=before_feedback_id))
+    
+    def iter_interactions(self, limit=100, offset=0, before=None, before_id=None, before_feedback_id=None,
+                          dedicated=False):
+        """Yield user interactions one at a time, fetching from SQLite in chunks
+        
+        Pass the timestamp, id and feedback_id of the last row seen as
+        `before`, `before_id` and `before_feedback_id` to fetch the next page
+        with an index seek instead of skipping `offset` rows. The full key is
+        needed because rows can share a timestamp, and an interaction with
+        several feedback entries spans several rows.
+        
+        Set `dedicated` when the consumer may be slow (e.g. a streamed HTTP
+        response) so it holds its own connection rather than a pooled one.
+        """
+        sql = '''
+            SELECT i.*, f.rating, f.feedback_text, f.id AS feedback_id
             FROM interactions i
             LEFT JOIN feedback f ON i.id = f.interaction_id
-            ORDER BY i.timestamp DESC
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
-        
-        interactions = []
-        for row in cursor.fetchall():
-            interactions.append({
-                'id': row[0],
-                'timestamp': row[1],
-                'user_question': row[2],
-                'ai_response': row[3],
-                'query_type': row[4],
-                'response_time_ms': row[5],
-                'session_id': row[6],
-                'user_ip': row[7],
-                'user_agent': row[8],
-                'rating': row[9],
-                'feedback_text': row[10]
-            })
-        
-        conn.close()
-        return interactions
+        '''
+        params = []
+        
+        if before and before_id:
+            # The plain timestamp bound lets idx_interactions_ts_desc drive the seek
+            sql += " WHERE i.timestamp <= ? AND (i.timestamp, i.id, COALESCE(f.id, '')) < (?, ?, ?)"
+            params.extend([before, before, before_id, before_feedback_id or ''])
+        elif before:
+            sql += ' WHERE i.timestamp < ?'
+            params.append(before)
+        
+        sql += " ORDER BY i.timestamp DESC, i.id DESC, COALESCE(f.id, '') DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        
+        with (self._dedicated_conn() if dedicated else self._get_conn()) as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = 500
+            cursor.execute(sql, params)
+            columns = [col[0] for col in cursor.description]
+            
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row))
     
     def get_analytics_summary(self):
-        """Get overall analytics summary"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total interactions
-        cursor.execute('SELECT COUNT(*) FROM interactions')
-        total_interactions = cursor.fetchone()[0]
-        
-        # Today's interactions
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute('SELECT COUNT(*) FROM interactions WHERE date(timestamp) = ?', (today,))
-        today_interactions = cursor.fetchone()[0]
-        
-        # Average response time
-        cursor.execute('SELECT AVG(response_time_ms) FROM interactions WHERE response_time_ms > 0')
-        avg_response_time = cursor.fetchone()[0] or 0
-        
-        # Total feedback
-        cursor.execute('SELECT COUNT(*) FROM feedback')
-        total_feedback = cursor.fetchone()[0]
-        
-        # Average rating
-        cursor.execute('SELECT AVG(rating) FROM feedback')
-        avg_rating = cursor.fetchone()[0] or 0
-        
-        # Top query types
-        cursor.execute('''
-            SELECT query_type, COUNT(*) as count 
-            FROM interactions 
-            GROUP BY query_type 
-            ORDER BY count DESC 
-            LIMIT 5
-        ''')
-        top_query_types = cursor.fetchall()
-        
-        # Recent activity (last 7 days)
-        week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-        cursor.execute('''
-            SELECT date(timestamp) as day, COUNT(*) as count
-            FROM interactions 
-            WHERE date(timestamp) >= ?
-            GROUP BY date(timestamp)
-            ORDER BY day DESC
-        ''', (week_ago,))
-        daily_activity = cursor.fetchall()
-        
-        conn.close()
+        """Get overall analytics summary (cached for cache_ttl seconds)"""
+        return self._get_cached('summary', self._load_analytics_summary)[0]
+    
+    def get_analytics_summary_json(self):
+        """Get the analytics summary pre-serialized as JSON bytes"""
+        return self._get_cached('summary', self._load_analytics_summary)[1]
+    
+    def _load_analytics_summary(self):
+        """Query the analytics summary and serialize it in the same step
+        
+        The dict and its JSON bytes share one cache entry, so /admin and
+        /admin/api/stats always agree and expire together.
+        """
+        summary = self._query_analytics_summary()
+        return summary, orjson.dumps(summary)
+    
+    def get_dashboard_bundle(self, limit=20):
+        """Get the analytics summary and recent interactions in one call
+        
+        The two reads run concurrently on separate pooled connections;
+        SQLite releases the GIL while a query executes, so they overlap.
+        """
+        stats = self._executor.submit(self.get_analytics_summary)
+        interactions = self.get_all_interactions(limit=limit)
+        return {
+            'stats': stats.result(),
+            'interactions': interactions
+        }
+    
+    def _query_analytics_summary(self):
+        """Run the analytics summary queries against the database"""
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            
+            # All metrics come from the daily rollups in a single round-trip;
+            # the two lists are packed as JSON arrays
+            today = datetime.now().strftime('%Y-%m-%d')
+            week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+            cursor.execute('''
+                WITH totals AS (
+                    SELECT COALESCE(SUM(n_interactions), 0) AS total_interactions,
+                           ROUND(1.0 * SUM(sum_response_time) / NULLIF(SUM(n_timed), 0), 2) AS avg_response_time,
+                           COALESCE(SUM(CASE WHEN day = :today THEN n_interactions END), 0) AS today_interactions
+                    FROM interaction_stats_daily
+                ),
+                fb AS (
+                    SELECT COALESCE(SUM(n_feedback), 0) AS total_feedback,
+                           ROUND(1.0 * SUM(sum_rating) / NULLIF(SUM(n_feedback), 0), 2) AS avg_rating
+                    FROM feedback_stats_daily
+                ),
+                top_types AS (
+                    SELECT json_group_array(json_array(query_type, count)) AS items
+                    FROM (
+                        SELECT NULLIF(query_type, '') AS query_type, SUM(n_interactions) AS count
+                        FROM interaction_stats_daily
+                        GROUP BY query_type
+                        ORDER BY count DESC
+                        LIMIT 5
+                    )
+                ),
+                daily AS (
+                    SELECT json_group_array(json_array(day, count)) AS items
+                    FROM (
+                        SELECT day, SUM(n_interactions) AS count
+                        FROM interaction_stats_daily
+                        WHERE day >= :week_ago
+                        GROUP BY day
+                        ORDER BY day DESC
+                    )
+                )
+                SELECT totals.total_interactions, totals.today_interactions, totals.avg_response_time,
+                       fb.total_feedback, fb.avg_rating, top_types.items, daily.items
+                FROM totals, fb, top_types, daily
+            ''', {'today': today, 'week_ago': week_ago})
+            (total_interactions, today_interactions, avg_response_time,
+             total_feedback, avg_rating, top_types_json, daily_json) = cursor.fetchone()
+            avg_response_time = avg_response_time or 0
+            avg_rating = avg_rating or 0
+            top_query_types = [tuple(item) for item in orjson.loads(top_types_json)]
+            daily_activity = [tuple(item) for item in orjson.loads(daily_json)]
         
         return {
             'total_interactions': total_interactions,
             'today_interactions': today_interactions,
-            'avg_response_time': round(avg_response_time, 2),
+            'avg_response_time': avg_response_time,
             'total_feedback': total_feedback,
-            'avg_rating': round(avg_rating, 2),
+            'avg_rating': avg_rating,
             'top_query_types': top_query_types,
             'daily_activity': daily_activity
         }
     
+    @staticmethod
+    def _next_day(day):
+        """Return the YYYY-MM-DD date after `day`, used as an exclusive upper bound"""
+        try:
+            return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        except ValueError:
+            # Not a plain date; compare against it as given
+            return day
+    
     def search_interactions(self, query, query_type=None, date_from=None, date_to=None):
         """Search interactions with filters"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         sql = '''
             SELECT i.*, f.rating, f.feedback_text
             FROM interactions i
             LEFT JOIN feedback f ON i.id = f.interaction_id
-            WHERE (i.user_question LIKE ? OR i.ai_response LIKE ?)
         '''
-        params = [f'%{query}%', f'%{query}%']
+        
+        # The trigram index needs at least three characters to match on
+        if self._has_fts and len(query) >= 3:
+            sql += ' WHERE i.id IN (SELECT id FROM interactions_fts WHERE interactions_fts MATCH ?)'
+            params = ['"' + query.replace('"', '""') + '"']
+        else:
+            # Escape LIKE wildcards so the query is matched literally, as the FTS path does
+            pattern = '%' + query.translate(_LIKE_ESCAPES) + '%'
+            sql += " WHERE (i.user_question LIKE ? ESCAPE '\\' OR i.ai_response LIKE ? ESCAPE '\\')"
+            params = [pattern, pattern]
         
         if query_type:
             sql += ' AND i.query_type = ?'
             params.append(query_type)
         
+        # Compare the raw ISO timestamp against day bounds so the timestamp
+        # index can drive a range scan instead of calling date() on every row
         if date_from:
-            sql += ' AND date(i.timestamp) >= ?'
+            sql += ' AND i.timestamp >= ?'
             params.append(date_from)
         
         if date_to:
-            sql += ' AND date(i.timestamp) <= ?'
-            params.append(date_to)
+            sql += ' AND i.timestamp < ?'
+            params.append(self._next_day(date_to))
         
         sql += ' ORDER BY i.timestamp DESC LIMIT 50'
         
-        cursor.execute(sql, params)
-        
-        interactions = []
-        for row in cursor.fetchall():
-            interactions.append({
-                'id': row[0],
-                'timestamp': row[1],
-                'user_question': row[2],
-                'ai_response': row[3],
-                'query_type': row[4],
-                'response_time_ms': row[5],
-                'session_id': row[6],
-                'user_ip': row[7],
-                'user_agent': row[8],
-                'rating': row[9],
-                'feedback_text': row[10]
-            })
-        
-        conn.close()
-        return interactions
+        with self._get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            return self._rows_to_dicts(cursor)
 
 def create_admin_app():
     """Create Flask app with admin dashboard"""
     app = Flask(__name__)
     dashboard = AdminDashboard()
     
+    # Compile the page templates once instead of re-parsing them per request
+    admin_template = app.jinja_env.from_string(ADMIN_TEMPLATE)
+    interactions_template = app.jinja_env.from_string(INTERACTIONS_TEMPLATE)
+    search_template = app.jinja_env.from_string(SEARCH_TEMPLATE)
+    
     @app.route('/admin')
     @app.route('/admin/')
     def admin_home():
         """Main admin dashboard"""
-        analytics = dashboard.get_analytics_summary()
-        recent_interactions = dashboard.get_all_interactions(limit=20)
+        bundle = dashboard.get_dashboard_bundle(limit=20)
         
-        return render_template_string(ADMIN_TEMPLATE, 
-                                    analytics=analytics, 
-                                    interactions=recent_interactions,
-                                    page_title="Admin Dashboard")
+        return admin_template.render(analytics=bundle['stats'], 
+                                     interactions=bundle['interactions'],
+                                     page_title="Admin Dashboard")
     
     @app.route('/admin/interactions')
     def admin_interactions():
         """View all interactions with pagination"""
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 50))
-        offset = (page - 1) * limit
-        
-        interactions = dashboard.get_all_interactions(limit=limit, offset=offset)
+        before = request.args.get('before')
+        before_id = request.args.get('before_id')
+        before_feedback_id = request.args.get('before_feedback_id')
+        # "Next" links carry a keyset cursor; plain page numbers fall back to OFFSET
+        offset = 0 if before else (page - 1) * limit
+        
+        interactions = dashboard.get_all_interactions(limit=limit, offset=offset, before=before,
+                                                      before_id=before_id, before_feedback_id=before_feedback_id)
         analytics = dashboard.get_analytics_summary()
         
-        return render_template_string(INTERACTIONS_TEMPLATE, 
-                                    interactions=interactions,
-                                    analytics=analytics,
-                                    page=page,
-                                    limit=limit,
-                                    page_title="All Interactions")
+        return interactions_template.render(interactions=interactions,
+                                            analytics=analytics,
+                                            page=page,
+                                            limit=limit,
+                                            page_title="All Interactions")
     
     @app.route('/admin/search')
     def admin_search():
@@ -238,26 +581,73 @@ def create_admin_app():
         else:
             interactions = []
         
-        return render_template_string(SEARCH_TEMPLATE,
-                                    interactions=interactions,
-                                    query=query,
-                                    query_type=query_type,
-                                    date_from=date_from,
-                                    date_to=date_to,
-                                    page_title="Search Interactions")
+        return search_template.render(interactions=interactions,
+                                      query=query,
+                                      query_type=query_type,
+                                      date_from=date_from,
+                                      date_to=date_to,
+                                      page_title="Search Interactions")
     
     @app.route('/admin/api/stats')
     def api_stats():
         """API endpoint for real-time stats"""
-        analytics = dashboard.get_analytics_summary()
-        return jsonify(analytics)
+        return Response(dashboard.get_analytics_summary_json(), mimetype='application/json')
     
     @app.route('/admin/api/interactions')
     def api_interactions():
-        """API endpoint for interactions"""
+        """API endpoint for interactions
+        
+        Pass the last returned timestamp, id and feedback_id as ?before=,
+        ?before_id= and ?before_feedback_id= to fetch the next page.
+        """
         limit = int(request.args.get('limit', 10))
-        interactions = dashboard.get_all_interactions(limit=limit)
-        return jsonify(interactions)
+        before = request.args.get('before')
+        before_id = request.args.get('before_id')
+        before_feedback_id = request.args.get('before_feedback_id')
+        
+        # Stream the JSON array row by row so large pages never sit in memory whole
+        def generate():
+            yield b'['
+            interactions = dashboard.iter_interactions(limit=limit, before=before, before_id=before_id,
+                                                       before_feedback_id=before_feedback_id, dedicated=True)
+            for index, interaction in enumerate(interactions):
+                yield (b',' if index else b'') + orjson.dumps(interaction)
+            yield b']'
+        
+        return Response(stream_with_context(generate()), mimetype='application/json')
+    
+    @app.route('/admin/api/bundle')
+    def api_bundle():
+        """API endpoint for stats and recent interactions in a single round-trip"""
+        limit = int(request.args.get('limit', 10))
+        bundle = dashboard.get_dashboard_bundle(limit=limit)
+        return Response(orjson.dumps(bundle), mimetype='application/json')
+    
+    @app.errorhandler(PoolTimeout)
+    def pool_timeout(error):
+        """Answer 503 rather than queueing requests behind a busy connection pool"""
+        return Response('Database busy, please retry', status=503, headers={'Retry-After': '1'})
+    
+    @app.after_request
+    def add_api_cache_headers(response):
+        """Let browsers reuse the stats briefly and revalidate other API JSON with an ETag
+        
+        Only /admin/api/stats is served from a TTL cache; the listing, search
+        and bundle endpoints read live data, so they must revalidate every time.
+        """
+        if request.path.startswith('/admin/api/') and response.status_code == 200:
+            if request.path == '/admin/api/stats':
+                response.headers['Cache-Control'] = (
+                    f'private, max-age={dashboard.cache_ttl}, '
+                    f'stale-while-revalidate={dashboard.cache_ttl * 2}'
+                )
+            else:
+                response.headers['Cache-Control'] = 'no-cache'
+            # Streamed bodies cannot be hashed up front
+            if not response.is_streamed:
+                response.add_etag()
+                response.make_conditional(request)
+        return response
     
     return app
 
@@ -490,7 +880,9 @@ INTERACTIONS_TEMPLATE = '''
             <a href="?page={{page-1}}&limit={{limit}}">← Previous</a>
             {% endif %}
             <span style="margin: 0 1rem;">Page {{page}}</span>
-            <a href="?page={{page+1}}&limit={{limit}}">Next →</a>
+            {% if interactions %}
+            <a href="?page={{page+1}}&limit={{limit}}&before={{interactions[-1].timestamp|urlencode}}&before_id={{interactions[-1].id|urlencode}}&before_feedback_id={{(interactions[-1].feedback_id or '')|urlencode}}">Next →</a>
+            {% endif %}
         </div>
     </div>
 </body>
@@ -1,12 +1,16 @@
 import os
 import json
+import orjson
 import boto3
 import botocore
 import time
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import sqlite3
+import threading
 from datetime import datetime
 from functools import wraps
 from flask import Flask, request, render_template_string, session, jsonify
@@ -41,8 +45,19 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize database systems
-feedback_system = SimpleBedrock("school_feedback.db")
+# Database systems are created on first use so importing the app doesn't
+# open the database or start the background writer
+_feedback_system = None
+_feedback_system_lock = threading.Lock()
+
+def get_feedback_system():
+    global _feedback_system
+    if _feedback_system is None:
+        with _feedback_system_lock:
+            if _feedback_system is None:
+                # Admin stats are dropped once queued feedback is actually committed
+                _feedback_system = SimpleBedrock("school_feedback.db", on_write=invalidate_admin_stats)
+    return _feedback_system
 
 # Production configurations
 app.config['SESSION_COOKIE_SECURE'] = os.environ.get('FLASK_ENV') == 'production'
@@ -158,11 +173,13 @@ def ping():
 def log_conversation_to_s3(query, response, query_type, user_name, api_key, response_time_ms=0):
     """Log conversation data to S3 for analytics and monitoring"""
     try:
-        conversation_id = f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        # Take the clock once so the id, timestamp and S3 date folder agree
+        now = datetime.now()
+        conversation_id = f"conv_{now.strftime('%Y%m%d_%H%M%S_%f')}"
         
         conversation_data = {
             "conversation_id": conversation_id,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "user_name": user_name,
             "api_key": api_key,
             "query": query,
@@ -177,7 +194,7 @@ def log_conversation_to_s3(query, response, query_type, user_name, api_key, resp
         }
         
         # Create S3 key with date-based folder structure
-        date_folder = datetime.now().strftime('%Y/%m/%d')
+        date_folder = now.strftime('%Y/%m/%d')
         s3_key = f"conversations/{date_folder}/{conversation_id}.json"
         
         # Upload to S3
@@ -196,11 +213,12 @@ def log_conversation_to_s3(query, response, query_type, user_name, api_key, resp
 def log_error_to_s3(query, error_message, query_type, user_name, api_key):
     """Log error conversations to S3"""
     try:
-        conversation_id = f"error_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        now = datetime.now()
+        conversation_id = f"error_{now.strftime('%Y%m%d_%H%M%S_%f')}"
         
         error_data = {
             "conversation_id": conversation_id,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "user_name": user_name,
             "api_key": api_key,
             "query": query,
@@ -215,7 +233,7 @@ def log_error_to_s3(query, error_message, query_type, user_name, api_key):
         }
         
         # Create S3 key with date-based folder structure
-        date_folder = datetime.now().strftime('%Y/%m/%d')
+        date_folder = now.strftime('%Y/%m/%d')
         s3_key = f"errors/{date_folder}/{conversation_id}.json"
         
         # Upload to S3
@@ -336,6 +354,25 @@ def classify_query(user_query):
 # -----------------------
 # External API Functions
 # -----------------------
+
+# One shared session keeps connections to external APIs alive between calls
+# instead of paying a new TCP + TLS handshake on every request. A transient
+# rate-limit or server error gets one quick retry; Retry-After is ignored so a
+# rate limit can't hold a chat request thread for as long as the server asks.
+http_retry = Retry(
+    total=1,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=http_retry))
+
+NEWS_CACHE_TTL = 300  # seconds (5 minutes)
+_news_cache = {}  # url -> (result, fetched_at)
+
 def get_news_data(query=""):
     """Get latest news headlines"""
     try:
@@ -360,10 +397,17 @@ def get_news_data(query=""):
             country = "gb"
         
         url = f"{EXTERNAL_APIS['news']['base_url']}?country={country}&apiKey={api_key}&pageSize=5"
-        response = requests.get(url, timeout=10)
+        
+        # Serve recent headlines from memory to save API quota and latency
+        cached = _news_cache.get(url)
+        if cached is not None and (time.time() - cached[1]) <= NEWS_CACHE_TTL:
+            return cached[0]
+        
+        # Two attempts of 5s each keep the worst case near the old single 10s timeout
+        response = http_session.get(url, timeout=5)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             articles = []
             for article in data.get("articles", [])[:5]:
                 articles.append({
@@ -371,7 +415,9 @@ def get_news_data(query=""):
                     "source": article["source"]["name"],
                     "description": article.get("description", "")[:100] + "..."
                 })
-            return {"news": articles}
+            result = {"news": articles}
+            _news_cache[url] = (result, time.time())
+            return result
         else:
             return {"error": f"News API error: {response.status_code}"}
     except Exception as e:
@@ -1078,12 +1124,16 @@ def submit_feedback():
         if not rating or rating < 1 or rating > 5:
             return jsonify({"success": False, "error": "Valid rating (1-5) required"}), 400
         
+        if not isinstance(feedback_text, str):
+            return jsonify({"success": False, "error": "feedback_text must be a string"}), 400
+        
         # Submit feedback using simplified system
-        feedback_id = feedback_system.add_feedback(
+        feedback_id = get_feedback_system().add_feedback(
             user_question="Previous interaction",
             ai_response="Generated response", 
             rating=rating,
-            feedback_text=feedback_text
+            feedback_text=feedback_text,
+            sync=False
         )
         
         return jsonify({
@@ -1100,37 +1150,67 @@ def submit_feedback():
 # ADMIN DASHBOARD ROUTES
 # -----------------------
 
+ADMIN_STATS_TTL = 30  # seconds
+_cached_admin_stats = None
+_last_admin_stats_time = 0
+_admin_stats_generation = 0  # bumped on every invalidation
+
+def load_admin_stats(cursor, tables):
+    """Count interactions and feedback and average the ratings"""
+    total_interactions = 0
+    total_feedback = 0
+    avg_rating = 0.0
+    
+    # Get stats only if tables exist
+    if 'interactions' in tables:
+        cursor.execute('SELECT COUNT(*) FROM interactions')
+        result = cursor.fetchone()
+        total_interactions = result[0] if result and result[0] is not None else 0
+    
+    if 'feedback' in tables:
+        # One scan for both the count and the (SQL-rounded) average
+        cursor.execute('SELECT COUNT(*) AS total, ROUND(AVG(rating), 2) AS avg_rating FROM feedback')
+        result = cursor.fetchone()
+        total_feedback = result['total']
+        avg_rating = result['avg_rating'] if result['avg_rating'] is not None else 0.0
+    
+    return total_interactions, total_feedback, avg_rating
+
+# Returns admin stats from memory so dashboard auto-refreshes don't rescan the tables every time
+def get_cached_admin_stats(cursor, tables):
+    global _cached_admin_stats, _last_admin_stats_time
+    stats = _cached_admin_stats
+    now = time.time()
+    if stats is None or (now - _last_admin_stats_time) > ADMIN_STATS_TTL:
+        generation = _admin_stats_generation
+        stats = load_admin_stats(cursor, tables)
+        # Don't cache a result that a write committed during the read has made stale
+        if generation == _admin_stats_generation:
+            _cached_admin_stats = stats
+            _last_admin_stats_time = now
+    return stats
+
+# Drops the cached admin stats; SimpleBedrock calls this after each committed
+# write so new feedback shows up on the next dashboard load
+def invalidate_admin_stats():
+    global _cached_admin_stats, _admin_stats_generation
+    _admin_stats_generation += 1
+    _cached_admin_stats = None
+
 @app.route("/admin")
 @app.route("/admin/")
 def admin_dashboard():
     """Admin dashboard to view all user interactions"""
     try:
         conn = sqlite3.connect("school_feedback.db")
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         # Check if tables exist first
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
         tables = [row[0] for row in cursor.fetchall()]
         
-        # Initialize with default values
-        total_interactions = 0
-        total_feedback = 0
-        avg_rating = 0.0
-        
-        # Get stats only if tables exist
-        if 'interactions' in tables:
-            cursor.execute('SELECT COUNT(*) FROM interactions')
-            result = cursor.fetchone()
-            total_interactions = result[0] if result and result[0] is not None else 0
-        
-        if 'feedback' in tables:
-            cursor.execute('SELECT COUNT(*) FROM feedback')
-            result = cursor.fetchone()
-            total_feedback = result[0] if result and result[0] is not None else 0
-            
-            cursor.execute('SELECT AVG(rating) FROM feedback WHERE rating IS NOT NULL')
-            result = cursor.fetchone()
-            avg_rating = round(result[0], 2) if result and result[0] is not None else 0.0
+        total_interactions, total_feedback, avg_rating = get_cached_admin_stats(cursor, tables)
         
         # Get recent interactions (only if tables exist)
         interactions = []
@@ -1138,7 +1218,14 @@ def admin_dashboard():
             try:
                 if 'feedback' in tables:
                     cursor.execute('''
-                        SELECT i.id, i.timestamp, i.user_question, i.ai_response, i.query_type, i.response_time_ms, f.rating, f.feedback_text
+                        SELECT COALESCE(NULLIF(i.id, ''), 'N/A') AS id,
+                               COALESCE(NULLIF(i.timestamp, ''), 'Unknown') AS timestamp,
+                               COALESCE(NULLIF(i.user_question, ''), 'No question') AS user_question,
+                               COALESCE(NULLIF(i.ai_response, ''), 'No response') AS ai_response,
+                               COALESCE(NULLIF(i.query_type, ''), 'unknown') AS query_type,
+                               COALESCE(i.response_time_ms, 0) AS response_time_ms,
+                               NULLIF(f.rating, 0) AS rating,
+                               NULLIF(f.feedback_text, '') AS feedback_text
                         FROM interactions i
                         LEFT JOIN feedback f ON i.id = f.interaction_id
                         ORDER BY i.timestamp DESC
@@ -1146,24 +1233,21 @@ def admin_dashboard():
                     ''')
                 else:
                     cursor.execute('''
-                        SELECT id, timestamp, user_question, ai_response, query_type, response_time_ms, NULL, NULL
+                        SELECT COALESCE(NULLIF(id, ''), 'N/A') AS id,
+                               COALESCE(NULLIF(timestamp, ''), 'Unknown') AS timestamp,
+                               COALESCE(NULLIF(user_question, ''), 'No question') AS user_question,
+                               COALESCE(NULLIF(ai_response, ''), 'No response') AS ai_response,
+                               COALESCE(NULLIF(query_type, ''), 'unknown') AS query_type,
+                               COALESCE(response_time_ms, 0) AS response_time_ms,
+                               NULL AS rating,
+                               NULL AS feedback_text
                         FROM interactions
                         ORDER BY timestamp DESC
                         LIMIT 20
                     ''')
                 
-                for row in cursor.fetchall():
-                    if row and len(row) >= 6:  # Ensure row exists and has minimum columns
-                        interactions.append({
-                            'id': row[0] or 'N/A',
-                            'timestamp': row[1] or 'Unknown',
-                            'user_question': row[2] or 'No question',
-                            'ai_response': row[3] or 'No response',
-                            'query_type': row[4] or 'unknown',
-                            'response_time_ms': row[5] or 0,
-                            'rating': row[6] if len(row) > 6 and row[6] else None,
-                            'feedback_text': row[7] if len(row) > 7 and row[7] else None
-                        })
+                # Defaults are filled in by the query, so rows map straight to dicts
+                interactions = [dict(row) for row in cursor.fetchall()]
             except Exception as e:
                 logger.error(f"Error querying interactions: {e}")
                 # Continue with empty interactions list
@@ -4,14 +4,24 @@ SIMPLE FEEDBACK APP - Guaranteed to show feedback button
 Just the basics: chat + visible feedback button
 """
 import os
-from flask import Flask, request, render_template_string, jsonify
+import threading
+from flask import Flask, request, jsonify
 from ultra_simple_bedrock import SimpleBedrock
 
 app = Flask(__name__)
 app.secret_key = "simple_secret_key_123"
 
-# Initialize feedback system
-feedback_system = SimpleBedrock("school_feedback.db")
+# Created lazily by get_feedback_system()
+_feedback_system = None
+_feedback_system_lock = threading.Lock()
+
+def get_feedback_system():
+    global _feedback_system
+    if _feedback_system is None:
+        with _feedback_system_lock:
+            if _feedback_system is None:
+                _feedback_system = SimpleBedrock("school_feedback.db")
+    return _feedback_system
 
 # Simple HTML template with GUARANTEED visible feedback button
 SIMPLE_HTML = """
@@ -171,6 +181,9 @@ SIMPLE_HTML = """
 </html>
 """
 
+# Compile the page template once instead of re-parsing it per request
+SIMPLE_TEMPLATE = app.jinja_env.from_string(SIMPLE_HTML)
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     response_text = "Welcome to the chatbot! Ask me anything."
@@ -180,7 +193,7 @@ def index():
         if user_input:
             response_text = f"You asked: '{user_input}' - This is a simple test response. The feedback button should be visible above!"
     
-    return render_template_string(SIMPLE_HTML, response_text=response_text)
+    return SIMPLE_TEMPLATE.render(response_text=response_text)
 
 @app.route("/submit_feedback", methods=["POST"])
 def submit_feedback():
@@ -192,17 +205,21 @@ def submit_feedback():
         if not rating or rating < 1 or rating > 5:
             return jsonify({"success": False, "error": "Invalid rating"})
         
-        # Add feedback to database
-        interaction_id = feedback_system.add_feedback(
+        if not isinstance(feedback_text, str):
+            return jsonify({"success": False, "error": "Invalid feedback text"})
+        
+        # Queue feedback for the background writer, which batches inserts
+        interaction_id = get_feedback_system().add_feedback(
             user_question="Simple test question",
             ai_response="Simple test response",
             rating=int(rating),
-            feedback_text=feedback_text
+            feedback_text=feedback_text,
+            sync=False
         )
         
         return jsonify({
             "success": True, 
-            "message": f"Feedback saved! Rating: {rating}/5",
+            "message": f"Feedback received! Rating: {rating}/5",
             "interaction_id": interaction_id
         })
         
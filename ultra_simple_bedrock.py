@@ -4,131 +4,401 @@ ULTRA-SIMPLE Bedrock Feedback System
 Works with existing database, focuses ONLY on collecting feedback and creating Bedrock training data
 """
 
+import atexit
 import sqlite3
 import json
+import queue
+import threading
+import time
 import uuid
 from datetime import datetime
 from typing import List, Dict
 
+import orjson
+
+# SQL used on every call, kept as constants so each statement is one fixed
+# string that the connection's statement cache compiles once
+_SQL_INSERT_INTERACTION = '''
+    INSERT INTO interactions (id, timestamp, user_question, ai_response, query_type, response_time_ms, session_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+_SQL_INSERT_FEEDBACK = '''
+    INSERT INTO feedback (id, interaction_id, timestamp, rating, feedback_text, is_helpful, user_ip)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+_SQL_TRAINING_ROWS = '''
+    SELECT i.user_question, i.ai_response, f.rating, f.feedback_text
+    FROM interactions i
+    JOIN feedback f ON i.id = f.interaction_id
+    ORDER BY f.rating DESC
+'''
+
+_SQL_RATING_DISTRIBUTION = 'SELECT rating, cnt FROM feedback_rating_counts WHERE cnt > 0 ORDER BY rating'
+
 class SimpleBedrock:
     """Super simple system: Feedback → Bedrock training data"""
     
-    def __init__(self, db_path: str = "school_feedback.db"):
+    def __init__(self, db_path: str = "school_feedback.db", batch_size: int = 100, flush_interval: float = 0.05, on_write=None):
         self.db_path = db_path
+        # Optional callback run after each committed write, e.g. to drop caches
+        self.on_write = on_write
+        # One long-lived connection keeps SQLite's page cache warm between calls
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+        self._conn.execute('PRAGMA cache_size=-64000')
+        self._conn.execute('PRAGMA mmap_size=268435456')
+        # Keep dirty pages in memory until commit when writing large batches
+        self._conn.execute('PRAGMA cache_spill=false')
+        # The connection is shared between request threads
+        self._lock = threading.Lock()
+        # Writes reuse one cursor; the SQL constants hit the statement cache
+        self._write_cursor = self._conn.cursor()
+        self._init_indexes()
+        self._rollups_ready = self._init_rollups()
+        
+        # Write-behind queue: feedback added with sync=False is written by a
+        # background thread in batches of up to batch_size, one commit each
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._write_q = queue.Queue()
+        threading.Thread(target=self._flusher, daemon=True).start()
+        
+        # Refresh planner statistics every analyze_every rows written, and
+        # let SQLite top them up with PRAGMA optimize when the process exits
+        self.analyze_every = 10000
+        self._rows_since_analyze = 0
+        self._closed = False
+        atexit.register(self.close)
     
-    def add_feedback(self, user_question: str, ai_response: str, rating: int, feedback_text: str = ""):
-        """Add feedback to existing database structure"""
+    def _init_indexes(self):
+        """Index feedback for the training export's join and rating order"""
+        with self._lock, self._conn:
+            tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            if 'feedback' not in tables:
+                return
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_interaction ON feedback (interaction_id)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_rating ON feedback (rating)')
+    
+    def _init_rollups(self) -> bool:
+        """Create the rating-count rollup used by get_stats, seeding it from existing feedback
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        Triggers on feedback keep the counts in step with every insert and
+        delete, whichever connection makes the change. The rollup is only
+        built together with its triggers, once the feedback table exists,
+        and is rebuilt if a trigger is missing or the counts have drifted.
+        Returns False while there is no feedback table yet.
+        """
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            names = {row[0] for row in self._conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+            if 'feedback' not in names:
+                return False
+            
+            needs_seed = (
+                'feedback_rating_counts' not in names
+                or 'trg_feedback_rating_ins' not in names
+                or 'trg_feedback_rating_del' not in names
+            )
+            if not needs_seed:
+                counted = self._conn.execute('SELECT COALESCE(SUM(cnt), 0) FROM feedback_rating_counts').fetchone()[0]
+                needs_seed = counted != self._conn.execute('SELECT COUNT(*) FROM feedback').fetchone()[0]
+            if not needs_seed:
+                return True
+            
+            self._conn.execute('DROP TRIGGER IF EXISTS trg_feedback_rating_ins')
+            self._conn.execute('DROP TRIGGER IF EXISTS trg_feedback_rating_del')
+            self._conn.execute('DROP TABLE IF EXISTS feedback_rating_counts')
+            self._conn.execute('''
+                CREATE TABLE feedback_rating_counts (
+                    rating INTEGER PRIMARY KEY,
+                    cnt INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            self._conn.execute('''
+                INSERT INTO feedback_rating_counts (rating, cnt)
+                SELECT rating, COUNT(*) FROM feedback GROUP BY rating
+            ''')
+            self._conn.execute('''
+                CREATE TRIGGER trg_feedback_rating_ins AFTER INSERT ON feedback
+                BEGIN
+                    INSERT INTO feedback_rating_counts (rating, cnt) VALUES (NEW.rating, 1)
+                    ON CONFLICT (rating) DO UPDATE SET cnt = cnt + 1;
+                END
+            ''')
+            self._conn.execute('''
+                CREATE TRIGGER trg_feedback_rating_del AFTER DELETE ON feedback
+                BEGIN
+                    UPDATE feedback_rating_counts SET cnt = cnt - 1 WHERE rating = OLD.rating;
+                END
+            ''')
+        return True
+    
+    def close(self):
+        """Write any queued feedback, run PRAGMA optimize and close the shared database connection"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Release the references that would otherwise keep this instance alive
+            atexit.unregister(self.close)
+            self._write_q.put(None)  # stops the flusher thread
+        self.flush()
+        with self._lock:
+            self._conn.execute('PRAGMA optimize')
+            self._conn.close()
+    
+    def _check_open(self):
+        """Refuse new writes once close() has been called"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("SimpleBedrock is closed")
+    
+    def flush(self):
+        """Block until all queued feedback has been written"""
+        self._write_q.join()
+    
+    def _flusher(self):
+        """Drain the write queue, batching whatever arrives within flush_interval, until close() sends None"""
+        stopping = False
+        while not stopping:
+            item = self._write_q.get()
+            if item is None:
+                self._write_q.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._write_q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # close() was called; write what we have, then stop
+                    self._write_q.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            try:
+                try:
+                    self._write_rows(batch)
+                except Exception:
+                    # Retry row by row so one bad entry doesn't drop the rest of the batch
+                    for row in batch:
+                        try:
+                            self._write_rows([row])
+                        except Exception as e:
+                            print(f"❌ Failed to write queued feedback {row[0][0]}: {e}")
+            finally:
+                for _ in batch:
+                    self._write_q.task_done()
+    
+    def _write_rows(self, rows: List[tuple]):
+        """Insert (interaction_row, feedback_row) pairs in a single transaction"""
+        with self._lock, self._conn:
+            self._write_cursor.executemany(_SQL_INSERT_INTERACTION, [interaction for interaction, _ in rows])
+            self._write_cursor.executemany(_SQL_INSERT_FEEDBACK, [feedback for _, feedback in rows])
+            
+            self._rows_since_analyze += len(rows)
+            needs_analyze = self._rows_since_analyze >= self.analyze_every
+            if needs_analyze:
+                self._rows_since_analyze = 0
         
-        # Add to interactions table
-        interaction_id = str(uuid.uuid4())
-        timestamp = datetime.now().isoformat()
+        # A failing callback must not look like a failed write to the flusher,
+        # which would retry rows that are already committed
+        if self.on_write is not None:
+            try:
+                self.on_write()
+            except Exception as e:
+                print(f"❌ on_write callback failed: {e}")
         
-        cursor.execute('''
-            INSERT INTO interactions (id, timestamp, user_question, ai_response, query_type, response_time_ms, session_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (interaction_id, timestamp, user_question, ai_response, "feedback", 1000, "system"))
+        if needs_analyze:
+            with self._lock:
+                self._conn.execute('ANALYZE interactions')
+                self._conn.execute('ANALYZE feedback')
+    
+    def add_feedback(self, user_question: str, ai_response: str, rating: int, feedback_text: str = "", sync: bool = True):
+        """Add feedback to existing database structure
         
-        # Add to feedback table
-        feedback_id = str(uuid.uuid4())
-        cursor.execute('''
-            INSERT INTO feedback (id, interaction_id, timestamp, rating, feedback_text, is_helpful, user_ip)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (feedback_id, interaction_id, timestamp, rating, feedback_text, rating >= 4, "127.0.0.1"))
+        With sync=False the rows are queued for the background writer and the
+        call returns immediately; use flush() to wait for them.
+        """
+        
+        row = self._feedback_row(user_question, ai_response, rating, feedback_text)
         
-        conn.commit()
-        conn.close()
+        if sync:
+            self._check_open()
+            self._write_rows([row])
+        else:
+            # Checked under the lock so the row can't land behind close()'s sentinel
+            with self._lock:
+                self._check_open()
+                self._write_q.put(row)
         
         print(f"✅ Added feedback: {rating}/5 stars")
-        return interaction_id
+        return row[0][0]  # interaction id
+    
+    def add_feedback_many(self, items) -> List[str]:
+        """Add several (user_question, ai_response, rating, feedback_text) entries in one transaction"""
+        rows = [self._feedback_row(*item) for item in items]
+        self._check_open()
+        if rows:
+            self._write_rows(rows)
+        
+        print(f"✅ Added {len(rows)} feedback entries")
+        return [interaction[0] for interaction, _ in rows]
     
-    def create_bedrock_training(self, output_file: str = None) -> str:
-        """Create Bedrock training file from feedback data"""
+    @staticmethod
+    def _feedback_row(user_question: str, ai_response: str, rating: int, feedback_text: str = "") -> tuple:
+        """Build the (interaction_row, feedback_row) pair written for one piece of feedback
+        
+        Values are coerced here, at enqueue time, so a malformed request fails
+        in its own call instead of in the background writer's batch.
+        """
+        rating = int(rating)
+        feedback_text = str(feedback_text or "")
+        user_question = str(user_question)
+        ai_response = str(ai_response)
+        
+        interaction_id = str(uuid.uuid4())
+        feedback_id = str(uuid.uuid4())
+        timestamp = datetime.now().isoformat()
+        
+        return (
+            # interactions row
+            (interaction_id, timestamp, user_question, ai_response, "feedback", 1000, "system"),
+            # feedback row
+            (feedback_id, interaction_id, timestamp, rating, feedback_text, rating >= 4, "127.0.0.1"),
+        )
+    
+    def create_bedrock_training(self, output_file: str = None, dedupe: bool = True) -> str:
+        """Create Bedrock training file from feedback data
+        
+        With dedupe=True only the first example for each exact
+        (question, answer) pair is written; rows arrive highest rating
+        first, so that is the best-rated copy.
+        """
         
         if not output_file:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_file = f"bedrock_training_{timestamp}.jsonl"
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get all interactions with feedback
-        cursor.execute('''
-            SELECT i.user_question, i.ai_response, f.rating, f.feedback_text
-            FROM interactions i
-            JOIN feedback f ON i.id = f.interaction_id
-            ORDER BY f.rating DESC
-        ''')
-        
-        data = cursor.fetchall()
-        conn.close()
-        
-        if not data:
-            print("❌ No feedback data found!")
-            return None
-        
-        # Create Bedrock format
-        training_examples = []
-        
-        for question, response, rating, feedback in data:
-            # Use high-rated responses as positive examples
-            if rating >= 4:
-                training_examples.append({
-                    "messages": [
-                        {"role": "user", "content": question},
-                        {"role": "assistant", "content": response}
-                    ],
-                    "metadata": {
-                        "rating": rating,
-                        "quality": "high"
-                    }
-                })
+        self.flush()
+        total_entries = 0
+        example_count = 0
+        duplicate_count = 0
+        seen = set()
+        
+        # Stream rows from the cursor into the file in fetchmany batches
+        # instead of building the whole result set and example list in memory first
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.arraysize = 500
+            
+            # Get all interactions with feedback
+            cursor.execute(_SQL_TRAINING_ROWS)
             
-            # Use feedback text as improved responses for low ratings
-            elif rating <= 3 and feedback.strip():
-                training_examples.append({
-                    "messages": [
-                        {"role": "user", "content": question},
-                        {"role": "assistant", "content": feedback}
-                    ],
-                    "metadata": {
-                        "rating": rating,
-                        "quality": "improved",
-                        "original_response": response
-                    }
-                })
-        
-        # Write JSONL file
-        with open(output_file, 'w') as f:
-            for example in training_examples:
-                f.write(json.dumps(example) + '\n')
+            rows = cursor.fetchmany()
+            if not rows:
+                print("❌ No feedback data found!")
+                return None
+            
+            # Write JSONL file, one batch of encoded lines at a time, through a
+            # 1 MiB buffer so large exports make few write syscalls
+            with open(output_file, 'wb', buffering=1 << 20) as f:
+                while rows:
+                    total_entries += len(rows)
+                    lines = []
+                    for question, response, rating, feedback in rows:
+                        example = self._training_example(question, response, rating, feedback)
+                        if example is None:
+                            continue
+                        if dedupe:
+                            key = (question, example["messages"][1]["content"])
+                            if key in seen:
+                                duplicate_count += 1
+                                continue
+                            seen.add(key)
+                        lines.append(orjson.dumps(example, option=orjson.OPT_APPEND_NEWLINE))
+                    f.writelines(lines)
+                    example_count += len(lines)
+                    rows = cursor.fetchmany()
         
         print(f"🤖 Created Bedrock training file: {output_file}")
-        print(f"   • Training examples: {len(training_examples)}")
-        print(f"   • Total feedback entries: {len(data)}")
+        print(f"   • Training examples: {example_count}")
+        print(f"   • Total feedback entries: {total_entries}")
+        if duplicate_count:
+            print(f"   • Duplicates skipped: {duplicate_count}")
         
         return output_file
     
+    @staticmethod
+    def _training_example(question: str, response: str, rating: int, feedback: str):
+        """Convert one feedback row into a Bedrock training example, or None to skip it"""
+        # Use high-rated responses as positive examples
+        if rating >= 4:
+            return {
+                "messages": [
+                    {"role": "user", "content": question},
+                    {"role": "assistant", "content": response}
+                ],
+                "metadata": {
+                    "rating": rating,
+                    "quality": "high"
+                }
+            }
+        
+        # Use feedback text as improved responses for low ratings
+        elif rating <= 3 and feedback.strip():
+            return {
+                "messages": [
+                    {"role": "user", "content": question},
+                    {"role": "assistant", "content": feedback}
+                ],
+                "metadata": {
+                    "rating": rating,
+                    "quality": "improved",
+                    "original_response": response
+                }
+            }
+        
+        return None
+    
     def get_stats(self):
         """Simple statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.flush()
         
-        cursor.execute('SELECT COUNT(*), AVG(rating) FROM feedback')
-        count, avg_rating = cursor.fetchone()
+        # The feedback table may have been created after this instance started
+        if not self._rollups_ready:
+            self._init_indexes()
+            self._rollups_ready = self._init_rollups()
         
-        cursor.execute('SELECT rating, COUNT(*) FROM feedback GROUP BY rating ORDER BY rating')
-        rating_dist = cursor.fetchall()
+        rating_dist = []
+        if self._rollups_ready:
+            with self._lock:
+                cursor = self._conn.cursor()
+                
+                # Read the maintained rollup instead of scanning feedback
+                cursor.execute(_SQL_RATING_DISTRIBUTION)
+                rating_dist = cursor.fetchall()
         
-        conn.close()
+        # Totals are folded from the distribution rather than queried separately
+        count = sum(cnt for _, cnt in rating_dist)
+        avg_rating = sum(rating * cnt for rating, cnt in rating_dist) / count if count else 0
         
         print(f"📊 FEEDBACK STATS:")
         print(f"   • Total feedback: {count or 0}")
         print(f"   • Average rating: {avg_rating or 0:.1f}/5")
         print(f"   • Rating distribution:")
-        for rating, cnt in (rating_dist or []):
+        for rating, cnt in rating_dist:
             print(f"     {rating} stars: {cnt} responses")
 
 def main():
@@ -140,9 +410,11 @@ def main():
     
     # Add sample feedback
     print("📝 Adding sample feedback...")
-    system.add_feedback("What is attendance?", "85% this month", 5, "Perfect!")
-    system.add_feedback("Show news", "Cannot access news", 2, "Connect to real news API")
-    system.add_feedback("Tell joke", "Why did chicken cross road?", 3, "Need better jokes")
+    system.add_feedback_many([
+        ("What is attendance?", "85% this month", 5, "Perfect!"),
+        ("Show news", "Cannot access news", 2, "Connect to real news API"),
+        ("Tell joke", "Why did chicken cross road?", 3, "Need better jokes"),
+    ])
     
     # Show stats
     system.get_stats()